@@ -0,0 +1,401 @@
+"""
+Two-Stage Cascade Detection
+
+Runs a cheap gate on every frame and the custom physics equipment YOLOv8
+model only when the gate passes, instead of running both models on every
+frame.
+
+Gates:
+    darknet - the COCO yolov3-tiny net from object_detection.py; the frame
+              passes if it finds anything above the gate threshold (its COCO
+              detections are also drawn, so nothing is lost from that model)
+    motion  - frame differencing; the frame passes if more than the gate
+              threshold fraction of pixels changed (no COCO detections)
+
+Modes:
+    frame - the custom model runs on the full frame
+    crops - the custom model runs on a padded crop around the gate's
+            candidate regions, results are shifted back to frame coordinates
+
+Every audit_every frames the custom model also runs on the full frame no
+matter what the gate said. Those frames measure the cost of running the
+custom model everywhere and count frames the gate would have dropped
+although the custom model found something (missed frames, as a fraction of
+audited frames with custom detections). In crops mode the audit also runs
+the crop and counts full-frame detections whose centers the crop left out
+(crop misses).
+
+Both models get one warm-up call on the first frame before timing starts.
+
+The FPS gain is measured against running both models on every frame for the
+darknet gate, and against running the custom model on every frame for the
+motion gate. It is unknown until the custom model has run on a full frame.
+
+Usage:
+    python cascade.py
+    python cascade.py --gate motion --mode crops --threshold 0.02
+
+Controls:
+    - Press 'q' to quit
+    - Press 's' to save screenshot
+    - Press '+' / '-' to raise / lower the gate threshold
+"""
+
+import argparse
+import time
+import cv2
+import numpy as np
+from object_detection import download_yolo_files, load_yolo_model, find_objects, draw_detections
+
+MODEL_PATH = "runs/detect/physics_equipment/weights/best.pt"
+
+
+class MotionGate:
+    """Frame differencing gate on a downscaled grayscale frame"""
+
+    baseline = "custom every frame"
+
+    def __init__(self, threshold=0.01, width=160):
+        self.threshold = threshold
+        self.width = width
+        self.previous = None
+
+    def warmup(self, frame):
+        """Nothing to warm up; frame differencing has no model"""
+
+    def __call__(self, frame):
+        """Return (passed, candidate boxes, detections to draw)"""
+        scale = self.width / frame.shape[1]
+        small = cv2.resize(frame, (self.width, max(1, int(frame.shape[0] * scale))))
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        previous, self.previous = self.previous, gray
+        if previous is None:
+            return True, [], ([], [], [])
+
+        changed = cv2.threshold(cv2.absdiff(gray, previous), 25, 255, cv2.THRESH_BINARY)[1]
+        if np.count_nonzero(changed) / changed.size <= self.threshold:
+            return False, [], ([], [], [])
+
+        x, y, w, h = cv2.boundingRect(changed)
+        box = [int(x / scale), int(y / scale), int(w / scale), int(h / scale)]
+        return True, [box], ([], [], [])
+
+
+class DarknetGate:
+    """
+    yolov3-tiny gate: passes if any COCO object is above the threshold.
+    Its detections are drawn at the same confidence as object_detection.py.
+    """
+
+    baseline = "both models"
+
+    def __init__(self, threshold=0.1, display_confidence=0.25):
+        if not download_yolo_files():
+            raise RuntimeError("Could not download the YOLOv3-tiny model files")
+        self.net, self.classes, self.colors, self.output_layers = load_yolo_model()
+        self.threshold = threshold
+        self.display_confidence = display_confidence
+
+    def warmup(self, frame):
+        """Run the net once so its initialization is not timed"""
+        find_objects(frame, self.net, self.output_layers, confidence_threshold=self.threshold)
+
+    def __call__(self, frame):
+        """Return (passed, candidate boxes, detections to draw)"""
+        boxes, confidences, class_ids = find_objects(
+            frame, self.net, self.output_layers,
+            confidence_threshold=min(self.threshold, self.display_confidence))
+
+        candidates = [box for box, confidence in zip(boxes, confidences)
+                      if confidence > self.threshold]
+        shown = [i for i, confidence in enumerate(confidences)
+                 if confidence > self.display_confidence]
+        detections = ([boxes[i] for i in shown], [confidences[i] for i in shown],
+                      [class_ids[i] for i in shown])
+        return len(candidates) > 0, candidates, detections
+
+
+def crop_region(boxes, frame_shape, padding=0.25, max_area=0.6):
+    """
+    Padded bounding box (x0, y0, x1, y1) around all candidate boxes, or None
+    if there are no candidates or the crop would cover most of the frame anyway.
+    """
+    if not boxes:
+        return None
+    height, width = frame_shape[:2]
+    boxes = np.asarray(boxes, dtype=float)
+    x0, y0 = boxes[:, 0].min(), boxes[:, 1].min()
+    x1, y1 = (boxes[:, 0] + boxes[:, 2]).max(), (boxes[:, 1] + boxes[:, 3]).max()
+    pad_x, pad_y = (x1 - x0) * padding, (y1 - y0) * padding
+    x0, y0 = int(max(0, x0 - pad_x)), int(max(0, y0 - pad_y))
+    x1, y1 = int(min(width, x1 + pad_x)), int(min(height, y1 + pad_y))
+    if x1 <= x0 or y1 <= y0 or (x1 - x0) * (y1 - y0) > max_area * width * height:
+        return None
+    return x0, y0, x1, y1
+
+
+class Cascade:
+    """Gate + custom model with pass rate, miss and timing statistics"""
+
+    def __init__(self, gate, custom_predict, mode='frame', audit_every=30):
+        """
+        gate: MotionGate or DarknetGate
+        custom_predict: function(image) -> (boxes, confidences, class_ids)
+        """
+        self.gate = gate
+        self.custom_predict = custom_predict
+        self.mode = mode
+        self.audit_every = audit_every
+
+        self.frames = 0
+        self.passed = 0
+        self.audited = 0
+        self.missed = 0
+        self.gate_seconds = 0.0
+        self.total_seconds = 0.0
+        self.full_custom_seconds = 0.0
+        self.full_custom_calls = 0
+        self.crop_audited = 0
+        self.crop_missed = 0
+
+    def warmup(self, frame):
+        """Run the gate and custom model once, outside the statistics"""
+        self.gate.warmup(frame)
+        self.custom_predict(frame)
+
+    def _run_custom(self, image):
+        start = time.perf_counter()
+        detections = self.custom_predict(image)
+        return detections, time.perf_counter() - start
+
+    def _run_crop(self, frame, region):
+        """Custom model on a crop, boxes shifted back to frame coordinates"""
+        x0, y0, x1, y1 = region
+        boxes, confidences, class_ids = self.custom_predict(frame[y0:y1, x0:x1])
+        boxes = [[x + x0, y + y0, w, h] for x, y, w, h in boxes]
+        return boxes, confidences, class_ids
+
+    def _audit_crop(self, frame, region, full_boxes):
+        """Count full-frame detections whose centers lie outside the crop"""
+        self._run_crop(frame, region)
+        x0, y0, x1, y1 = region
+        for x, y, w, h in full_boxes:
+            center_x, center_y = x + w / 2, y + h / 2
+            self.crop_audited += 1
+            self.crop_missed += not (x0 <= center_x < x1 and y0 <= center_y < y1)
+
+    def __call__(self, frame):
+        """
+        Run the cascade on a frame.
+        Returns (gate detections, custom detections), each as
+        (boxes, confidences, class_ids) in frame coordinates.
+        """
+        start = time.perf_counter()
+        passed, candidates, gate_detections = self.gate(frame)
+        self.gate_seconds += time.perf_counter() - start
+
+        self.frames += 1
+        self.passed += passed
+        audit = self.audit_every > 0 and (self.frames - 1) % self.audit_every == 0
+
+        custom_detections = ([], [], [])
+        region = crop_region(candidates, frame.shape) if self.mode == 'crops' else None
+
+        if audit or (passed and region is None):
+            custom_detections, seconds = self._run_custom(frame)
+            self.full_custom_seconds += seconds
+            self.full_custom_calls += 1
+            if audit and len(custom_detections[0]) > 0:
+                self.audited += 1
+                self.missed += not passed
+                if passed and region is not None:
+                    self._audit_crop(frame, region, custom_detections[0])
+        elif passed:
+            custom_detections = self._run_crop(frame, region)
+
+        self.total_seconds += time.perf_counter() - start
+        return gate_detections, custom_detections
+
+    def stats(self):
+        """
+        Pass rate, miss rates and FPS compared to the gate's baseline.
+        miss_rate counts frames the gate dropped; crop_miss_rate counts
+        detections the crop left out (None outside crops mode or before any
+        audited crop). baseline_fps and speedup are None until the custom
+        model has run on a full frame.
+        """
+        frames = max(self.frames, 1)
+        cascade_seconds = self.total_seconds / frames
+        baseline_fps = speedup = None
+        if self.full_custom_calls and cascade_seconds > 0:
+            # Custom model on every frame, estimated from the full-frame runs.
+            # The darknet gate's own time counts too, since the node runs that
+            # model on every frame anyway.
+            baseline_seconds = self.full_custom_seconds / self.full_custom_calls
+            if isinstance(self.gate, DarknetGate):
+                baseline_seconds += self.gate_seconds / frames
+            baseline_fps = 1.0 / baseline_seconds
+            speedup = baseline_seconds / cascade_seconds
+        return {
+            'frames': self.frames,
+            'pass_rate': self.passed / frames,
+            'miss_rate': self.missed / max(self.audited, 1),
+            'crop_miss_rate': self.crop_missed / self.crop_audited if self.crop_audited else None,
+            'fps': 1.0 / cascade_seconds if cascade_seconds > 0 else 0.0,
+            'baseline': self.gate.baseline,
+            'baseline_fps': baseline_fps,
+            'speedup': speedup,
+        }
+
+
+def draw_merged(frame, gate_detections, gate_names, custom_detections, custom_names):
+    """Draw gate (COCO) and custom detections, one color per source"""
+    draw_detections(frame, *gate_detections, gate_names, [(255, 128, 0)] * len(gate_names))
+    draw_detections(frame, *custom_detections, custom_names, [(0, 255, 0)] * len(custom_names))
+    return frame
+
+
+def make_gate(kind, threshold):
+    """Build a gate, using each gate's default threshold if none is given"""
+    if kind == 'motion':
+        return MotionGate() if threshold is None else MotionGate(threshold)
+    return DarknetGate() if threshold is None else DarknetGate(threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cascade: cheap gate before the custom model")
+    parser.add_argument('--gate', choices=['darknet', 'motion'], default='darknet')
+    parser.add_argument('--mode', choices=['frame', 'crops'], default='frame')
+    parser.add_argument('--threshold', type=float, default=None,
+                        help="gate threshold (darknet confidence / motion pixel fraction)")
+    parser.add_argument('--audit-every', type=int, default=30,
+                        help="run the custom model on every Nth frame regardless of the gate")
+    parser.add_argument('--model', default=MODEL_PATH)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Cascade Detection - Gate + Custom Physics Equipment Model")
+    print("=" * 60)
+    print()
+
+    print(f"Loading model: {args.model}")
+    try:
+        from ultralytics import YOLO
+        from detect_custom import result_to_lists
+
+        model = YOLO(args.model)
+        print("[OK] Model loaded successfully!")
+    except Exception as e:
+        print(f"[ERROR] Could not load model: {e}")
+        print()
+        print("Make sure you've trained the model first using: python train_local.py")
+        return
+
+    def custom_predict(image):
+        return result_to_lists(model(image, conf=0.25, verbose=False)[0])
+
+    print(f"Loading {args.gate} gate...")
+    try:
+        gate = make_gate(args.gate, args.threshold)
+        print("[OK] Gate ready")
+    except Exception as e:
+        print(f"[ERROR] Could not load gate: {e}")
+        return
+
+    if args.gate == 'motion':
+        print("[NOTE] The motion gate shows custom detections only (no COCO detections)")
+
+    cascade = Cascade(gate, custom_predict, mode=args.mode, audit_every=args.audit_every)
+    gate_names = getattr(gate, 'classes', [])
+    custom_names = model.names
+
+    print("Opening webcam...")
+    cap = cv2.VideoCapture(0)
+    if not cap.isOpened():
+        print("[ERROR] Could not open webcam")
+        return
+
+    print("[OK] Webcam opened")
+    print()
+    print("=" * 60)
+    print("CONTROLS:")
+    print("  Press 'q' to quit")
+    print("  Press 's' to save screenshot")
+    print("  Press '+' / '-' to raise / lower the gate threshold")
+    print("=" * 60)
+    print()
+
+    ret, frame = cap.read()
+    if not ret:
+        print("[ERROR] Could not read from webcam")
+        cap.release()
+        return
+    print("Warming up models...")
+    cascade.warmup(frame)
+
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            print("Failed to grab frame")
+            break
+
+        gate_detections, custom_detections = cascade(frame)
+
+        # Merged output: COCO detections from the gate and custom detections
+        draw_merged(frame, gate_detections, gate_names, custom_detections, custom_names)
+
+        stats = cascade.stats()
+        gain = "x?" if stats['speedup'] is None else f"x{stats['speedup']:.2f}"
+        misses = f"Gate miss: {stats['miss_rate']:.0%}"
+        if args.mode == 'crops':
+            crop_miss = stats['crop_miss_rate']
+            misses += " | Crop miss: " + ("?" if crop_miss is None else f"{crop_miss:.0%}")
+        cv2.putText(frame, f"Pass: {stats['pass_rate']:.0%} | {misses} | "
+                           f"Gate: {gate.threshold:.3f}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        cv2.putText(frame, f"FPS: {stats['fps']:.1f} ({gain} vs {stats['baseline']})",
+                    (10, 55), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+        cv2.imshow('Cascade Detection', frame)
+
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('q'):
+            print("\nQuitting...")
+            break
+        elif key == ord('s'):
+            filename = f"cascade_{cascade.frames}.jpg"
+            cv2.imwrite(filename, frame)
+            print(f"Saved screenshot: {filename}")
+        elif key in (ord('+'), ord('=')):
+            gate.threshold = min(gate.threshold * 1.25, 1.0)
+            print(f"Gate threshold: {gate.threshold:.3f}")
+        elif key == ord('-'):
+            gate.threshold /= 1.25
+            print(f"Gate threshold: {gate.threshold:.3f}")
+
+    cap.release()
+    cv2.destroyAllWindows()
+
+    stats = cascade.stats()
+    print()
+    print("=" * 60)
+    print("Cascade summary")
+    print("=" * 60)
+    print(f"Frames:          {stats['frames']}")
+    print(f"Gate pass rate:  {stats['pass_rate']:.1%}")
+    print(f"Gate misses:     {stats['miss_rate']:.1%} of audited frames with detections")
+    if args.mode == 'crops':
+        if stats['crop_miss_rate'] is None:
+            print("Crop misses:     unknown (no audited frame used a crop)")
+        else:
+            print(f"Crop misses:     {stats['crop_miss_rate']:.1%} of audited detections outside the crop")
+    print(f"Cascade FPS:     {stats['fps']:.1f}")
+    if stats['speedup'] is None:
+        print("FPS gain:        unknown (custom model never ran on a full frame)")
+    else:
+        print(f"Baseline FPS:    {stats['baseline_fps']:.1f} ({stats['baseline']}, estimated)")
+        print(f"FPS gain:        x{stats['speedup']:.2f} vs {stats['baseline']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,10 +13,23 @@ Usage:
 Controls:
     - Press 'q' to quit
     - Press 's' to save screenshot
+    - Press 'l' to start/stop logging detections to detections_custom.dlog
 """
 
 from ultralytics import YOLO
 import cv2
+import time
+from detection_log import DetectionLogWriter
+
+def result_to_lists(result):
+    """Convert an ultralytics result to boxes ([x, y, w, h]), confidences and class_ids"""
+    # Copy: on CPU the array shares memory with the result used by plot()
+    xyxy = result.boxes.xyxy.cpu().numpy().copy()
+    xyxy[:, 2:] -= xyxy[:, :2]
+    boxes = xyxy.round().astype(int).tolist()
+    confidences = result.boxes.conf.cpu().numpy().tolist()
+    class_ids = result.boxes.cls.cpu().numpy().astype(int).tolist()
+    return boxes, confidences, class_ids
 
 def main():
     print("=" * 60)
@@ -54,12 +67,14 @@ def main():
     print("CONTROLS:")
     print("  Press 'q' to quit")
     print("  Press 's' to save screenshot")
+    print("  Press 'l' to start/stop logging detections")
     print("=" * 60)
     print()
     print("Show your physics equipment to the camera!")
     print()
     
     frame_count = 0
+    detection_log = None
     
     while True:
         ret, frame = cap.read()
@@ -72,6 +87,9 @@ def main():
         # Run inference
         results = model(frame, conf=0.25, verbose=False)
         
+        if detection_log is not None:
+            detection_log.append_frame(frame_count, time.time(), *result_to_lists(results[0]))
+        
         # Draw results on frame
         annotated_frame = results[0].plot()
         
@@ -92,8 +110,21 @@ def main():
             filename = f"detection_{frame_count}.jpg"
             cv2.imwrite(filename, annotated_frame)
             print(f"Saved screenshot: {filename}")
+        elif key == ord('l'):
+            if detection_log is None:
+                try:
+                    detection_log = DetectionLogWriter("detections_custom.dlog")
+                    print("Logging detections to detections_custom.dlog")
+                except (OSError, ValueError) as e:
+                    print(f"Could not open detection log: {e}")
+            else:
+                detection_log.close()
+                detection_log = None
+                print("Stopped logging detections")
     
     # Cleanup
+    if detection_log is not None:
+        detection_log.close()
     cap.release()
     cv2.destroyAllWindows()
     print("Done!")
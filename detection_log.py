@@ -0,0 +1,385 @@
+"""
+Compact Detection Records and Binary Detection Log
+
+Detections leave the detectors as plain Python lists (boxes, confidences,
+class_ids). This module packs them into a fixed-size NumPy record and stores
+them in an append-only binary log that can be written at video rate and read
+back with a memory map, so a 24/7 stream can be queried by frame, time range
+or class without loading the whole file.
+
+Files:
+    detections.dlog      - 16 byte header followed by packed DETECTION_DTYPE records
+    detections.dlog.idx  - 16 byte header followed by one INDEX_DTYPE entry per chunk
+
+Records are buffered and written in chunks. The data is written before its
+index entry, so if the process dies mid-chunk the reader simply never sees
+the torn tail (and the writer drops it when the log is reopened). If the
+index file is lost, the writer rebuilds it from the data file.
+
+Frame numbers are stored as the caller passes them. Detectors restart their
+frame counter at every run, so every writer opens a new session (numbered in
+the index) and frame numbers only have to be non-decreasing within a session.
+A rebuilt index starts a new session wherever the frame number drops.
+
+Usage:
+    with DetectionLogWriter("detections.dlog") as log:
+        log.append_frame(frame_index, time.time(), boxes, confidences, class_ids)
+
+    reader = DetectionLogReader("detections.dlog")
+    frame_120 = reader.frame(120, session=reader.sessions[-1])
+    last_minute = reader.query(t_start=time.time() - 60)
+    motors = reader.query(class_id=0)
+"""
+
+import os
+import time
+import numpy as np
+
+# One detection: 26 bytes on disk. Box is x, y, w, h in pixels (same layout
+# as the lists produced by the detectors).
+DETECTION_DTYPE = np.dtype([
+    ('frame', '<u4'),
+    ('timestamp', '<f8'),
+    ('class_id', '<u2'),
+    ('score', '<f4'),
+    ('box', '<i2', (4,)),
+])
+
+# One entry per chunk. class_mask has bit (class_id % 64) set for every class
+# in the chunk, so it can only give false positives, never miss a chunk.
+# A chunk never spans two sessions.
+INDEX_DTYPE = np.dtype([
+    ('start', '<u8'),
+    ('session', '<u4'),
+    ('count', '<u4'),
+    ('first_frame', '<u4'),
+    ('last_frame', '<u4'),
+    ('t_min', '<f8'),
+    ('t_max', '<f8'),
+    ('class_mask', '<u8'),
+])
+
+DATA_MAGIC = b'DLOG'
+INDEX_MAGIC = b'DIDX'
+FORMAT_VERSION = 2
+HEADER_SIZE = 16
+
+
+def _make_header(magic, itemsize):
+    """Build the 16 byte file header: magic, version, record size, padding"""
+    header = np.zeros(1, dtype=[('magic', 'S4'), ('version', '<u4'),
+                                ('itemsize', '<u4'), ('reserved', '<u4')])
+    header['magic'] = magic
+    header['version'] = FORMAT_VERSION
+    header['itemsize'] = itemsize
+    return header.tobytes()
+
+
+def _check_header(f, magic, itemsize, path):
+    """Validate the header of an existing log file"""
+    header = f.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE or header[:4] != magic:
+        raise ValueError(f"{path} is not a detection log file")
+    if header != _make_header(magic, itemsize):
+        raise ValueError(f"{path} was written with an incompatible log format")
+
+
+def _class_mask(class_ids):
+    """Bitmask with bit (class_id % 64) set for every class present"""
+    bits = np.unique(class_ids.astype(np.uint64) % np.uint64(64))
+    return int(np.bitwise_or.reduce(np.left_shift(np.uint64(1), bits), initial=np.uint64(0)))
+
+
+def _read_index(f, data_size):
+    """
+    Read the index entries after the header, dropping a torn trailing entry
+    and any entry that points past the records actually in the data file.
+    """
+    index_bytes = f.read()
+    entries = len(index_bytes) // INDEX_DTYPE.itemsize
+    index = np.frombuffer(index_bytes[:entries * INDEX_DTYPE.itemsize], dtype=INDEX_DTYPE)
+    data_records = max(data_size - HEADER_SIZE, 0) // DETECTION_DTYPE.itemsize
+    complete = np.flatnonzero(index['start'] + index['count'] > data_records)
+    return index[:complete[0]] if len(complete) else index
+
+
+def _index_entry(chunk, start, session):
+    """Index entry for a chunk of records stored from record number start"""
+    entry = np.zeros(1, dtype=INDEX_DTYPE)
+    entry['start'] = start
+    entry['session'] = session
+    entry['count'] = len(chunk)
+    entry['first_frame'] = chunk['frame'].min()
+    entry['last_frame'] = chunk['frame'].max()
+    entry['t_min'] = chunk['timestamp'].min()
+    entry['t_max'] = chunk['timestamp'].max()
+    entry['class_mask'] = _class_mask(chunk['class_id'])
+    return entry
+
+
+def make_records(frame_index, timestamp, boxes, confidences, class_ids):
+    """
+    Pack one frame's detections into a DETECTION_DTYPE array.
+
+    boxes is a list of [x, y, w, h]; confidences and class_ids are parallel lists.
+    """
+    count = len(boxes)
+    records = np.empty(count, dtype=DETECTION_DTYPE)
+    records['frame'] = frame_index
+    records['timestamp'] = timestamp
+    if count:
+        records['class_id'] = np.asarray(class_ids)
+        records['score'] = np.asarray(confidences)
+        records['box'] = np.clip(np.asarray(boxes), -32768, 32767)
+    return records
+
+
+class DetectionLogWriter:
+    """Append-only writer for a detection log"""
+
+    def __init__(self, path, chunk_size=4096, flush_interval=5.0):
+        """
+        Open (or create) a log for appending.
+
+        chunk_size: records buffered before a chunk is written
+        flush_interval: seconds after which a partial chunk is written anyway,
+                        so quiet streams still reach disk
+        """
+        self.path = path
+        self.index_path = path + '.idx'
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+
+        self._pending = []
+        self._pending_count = 0
+        self._last_flush = time.monotonic()
+        self._next_start = 0
+        self._last_frame = 0
+        self.session = 0
+
+        self._data = open(path, 'ab+')
+        self._index = open(self.index_path, 'ab+')
+
+        try:
+            if self._data.tell() == 0:
+                self._data.write(_make_header(DATA_MAGIC, DETECTION_DTYPE.itemsize))
+                self._index.truncate(0)
+                self._index.write(_make_header(INDEX_MAGIC, INDEX_DTYPE.itemsize))
+            elif self._index.tell() == 0:
+                self._rebuild_index()
+            else:
+                self._recover()
+        except Exception:
+            self._data.close()
+            self._index.close()
+            raise
+
+    def _resume(self, index):
+        """Continue after the last chunk of an existing index, in a new session"""
+        if len(index):
+            self._next_start = int(index['start'][-1] + index['count'][-1])
+            self.session = int(index['session'].max()) + 1
+
+    def _recover(self):
+        """Drop anything past the last complete chunk of an existing log"""
+        self._data.seek(0)
+        _check_header(self._data, DATA_MAGIC, DETECTION_DTYPE.itemsize, self.path)
+        self._index.seek(0)
+        _check_header(self._index, INDEX_MAGIC, INDEX_DTYPE.itemsize, self.index_path)
+
+        index = _read_index(self._index, os.fstat(self._data.fileno()).st_size)
+        self._index.truncate(HEADER_SIZE + len(index) * INDEX_DTYPE.itemsize)
+
+        # _read_index only keeps entries inside the data, so this never extends it
+        self._resume(index)
+        self._data.truncate(HEADER_SIZE + self._next_start * DETECTION_DTYPE.itemsize)
+
+    def _rebuild_index(self):
+        """Recreate a missing index from the complete records in the data file"""
+        self._data.seek(0)
+        _check_header(self._data, DATA_MAGIC, DETECTION_DTYPE.itemsize, self.path)
+        total = (self._data.seek(0, os.SEEK_END) - HEADER_SIZE) // DETECTION_DTYPE.itemsize
+        self._data.truncate(HEADER_SIZE + total * DETECTION_DTYPE.itemsize)
+
+        self._index.write(_make_header(INDEX_MAGIC, INDEX_DTYPE.itemsize))
+        entries = []
+        if total:
+            records = np.memmap(self.path, dtype=DETECTION_DTYPE, mode='r',
+                                offset=HEADER_SIZE, shape=(total,))
+            # A dropping frame number marks the start of a new session
+            sessions = np.concatenate([[0], np.cumsum(np.diff(records['frame'].astype(np.int64)) < 0)])
+            bounds = np.flatnonzero(np.diff(sessions)) + 1
+            for first, last in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [total]])):
+                for start in range(first, last, self.chunk_size):
+                    chunk = records[start:min(start + self.chunk_size, last)]
+                    entries.append(_index_entry(chunk, start, sessions[start]))
+                    self._index.write(entries[-1].tobytes())
+            del records
+        self._index.flush()
+
+        self._resume(np.concatenate(entries) if entries else np.empty(0, dtype=INDEX_DTYPE))
+
+    def append(self, records):
+        """
+        Append a DETECTION_DTYPE array. Frame numbers must not decrease
+        within a session (one writer).
+        """
+        if len(records):
+            frames = records['frame'].astype(np.int64)
+            if frames[0] < self._last_frame or np.any(np.diff(frames) < 0):
+                raise ValueError(f"frame numbers must not decrease within a session "
+                                 f"(last written: {self._last_frame})")
+            self._last_frame = int(frames[-1])
+            self._pending.append(records)
+            self._pending_count += len(records)
+
+        if (self._pending_count >= self.chunk_size or
+                time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def append_frame(self, frame_index, timestamp, boxes, confidences, class_ids):
+        """Append one frame's detections from the detector's lists"""
+        self.append(make_records(frame_index, timestamp, boxes, confidences, class_ids))
+
+    def flush(self):
+        """Write buffered records as one chunk, then its index entry"""
+        self._last_flush = time.monotonic()
+        if not self._pending_count:
+            return
+
+        chunk = np.concatenate(self._pending)
+        self._pending = []
+        self._pending_count = 0
+
+        entry = _index_entry(chunk, self._next_start, self.session)
+
+        self._data.write(chunk.tobytes())
+        self._data.flush()
+        self._index.write(entry.tobytes())
+        self._index.flush()
+        self._next_start += len(chunk)
+
+    def close(self):
+        """Flush remaining records and close the files"""
+        if self._data.closed:
+            return
+        self.flush()
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class DetectionLogReader:
+    """Memory-mapped reader for a detection log"""
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + '.idx'
+
+        with open(path, 'rb') as f:
+            _check_header(f, DATA_MAGIC, DETECTION_DTYPE.itemsize, path)
+            data_size = os.fstat(f.fileno()).st_size
+
+        with open(self.index_path, 'rb') as f:
+            _check_header(f, INDEX_MAGIC, INDEX_DTYPE.itemsize, self.index_path)
+            self.index = _read_index(f, data_size)
+
+        # Only map records covered by the index; a torn tail is ignored
+        total = int(self.index['start'][-1] + self.index['count'][-1]) if len(self.index) else 0
+        if total:
+            self.records = np.memmap(path, dtype=DETECTION_DTYPE, mode='r',
+                                     offset=HEADER_SIZE, shape=(total,))
+        else:
+            self.records = np.empty(0, dtype=DETECTION_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _chunk_slice(self, chunk):
+        start = int(self.index['start'][chunk])
+        return self.records[start:start + int(self.index['count'][chunk])]
+
+    @property
+    def sessions(self):
+        """Session numbers present in the log, oldest first"""
+        return np.unique(self.index['session']).tolist()
+
+    def frame(self, frame_index, session=None):
+        """
+        Return all detections for one frame. Frame numbers restart in every
+        session, so without a session the matches of all sessions are returned.
+        """
+        keep = (self.index['first_frame'] <= frame_index) & (self.index['last_frame'] >= frame_index)
+        if session is not None:
+            keep &= self.index['session'] == session
+        parts = []
+        for chunk in np.flatnonzero(keep):
+            records = self._chunk_slice(chunk)
+            lo, hi = np.searchsorted(records['frame'], [frame_index, frame_index + 1])
+            parts.append(records[lo:hi])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=DETECTION_DTYPE)
+
+    def query(self, t_start=None, t_end=None, class_id=None, session=None):
+        """
+        Return detections with t_start <= timestamp < t_end and, if given,
+        the matching class and session. Only chunks whose index entry can
+        match are read.
+        """
+        keep = np.ones(len(self.index), dtype=bool)
+        if session is not None:
+            keep &= self.index['session'] == session
+        if t_start is not None:
+            keep &= self.index['t_max'] >= t_start
+        if t_end is not None:
+            keep &= self.index['t_min'] < t_end
+        if class_id is not None:
+            bit = np.uint64(1) << np.uint64(class_id % 64)
+            keep &= (self.index['class_mask'] & bit) != 0
+
+        parts = []
+        for chunk in np.flatnonzero(keep):
+            records = self._chunk_slice(chunk)
+            mask = np.ones(len(records), dtype=bool)
+            if t_start is not None:
+                mask &= records['timestamp'] >= t_start
+            if t_end is not None:
+                mask &= records['timestamp'] < t_end
+            if class_id is not None:
+                mask &= records['class_id'] == class_id
+            parts.append(records[mask])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=DETECTION_DTYPE)
+
+
+def main():
+    """Print a summary of a detection log"""
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else 'detections.dlog'
+    if not os.path.exists(path):
+        print(f"[ERROR] Log not found: {path}")
+        return
+
+    reader = DetectionLogReader(path)
+    print("=" * 60)
+    print(f"Detection log: {path}")
+    print("=" * 60)
+    print(f"Chunks:     {len(reader.index)}")
+    print(f"Detections: {len(reader)}")
+    print(f"Sessions:   {len(reader.sessions)}")
+    if len(reader):
+        duration = reader.index['t_max'].max() - reader.index['t_min'].min()
+        print(f"Duration:   {duration:.1f} s")
+        classes, counts = np.unique(reader.records['class_id'], return_counts=True)
+        print()
+        print("Detections per class:")
+        for class_id, count in zip(classes, counts):
+            print(f"  {class_id:3d}: {count}")
+
+
+if __name__ == "__main__":
+    main()
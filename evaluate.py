@@ -0,0 +1,374 @@
+"""
+Accuracy + Speed Evaluation on the Validation Split
+
+Runs one of the detectors over dataset/images/val, compares the predictions
+with dataset/labels/val and reports COCO-style mAP@0.5 and mAP@0.5:0.95
+together with throughput, so every performance setting (input size,
+confidence threshold, quantized weights, ...) can be placed on a
+speed/accuracy curve.
+
+Predictions (float xyxy boxes, not the rounded detection log records) are
+cached in .eval_cache/ under a hash of the detector, its weights, its
+settings and the val images, so re-scoring a run is instant and only a
+changed configuration runs inference again. A cached run reports the
+throughput measured when it was cached and is marked as such in
+eval_results.csv; use --no-cache to measure it again.
+
+Usage:
+    python evaluate.py --detector custom
+    python evaluate.py --detector custom --imgsz 320
+    python evaluate.py --detector darknet
+
+The darknet model predicts COCO classes, which do not line up with the 15
+physics equipment classes, so it is always evaluated with --agnostic (all
+classes merged into one), which measures how well it localizes objects at all.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+import cv2
+import numpy as np
+
+DATASET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dataset')
+CACHE_DIR = '.eval_cache'
+RESULTS_CSV = 'eval_results.csv'
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+CACHE_VERSION = 2
+
+
+def load_class_names(data_yaml):
+    """Read the 'names' mapping from data.yaml"""
+    names = {}
+    in_names = False
+    with open(data_yaml, 'r') as f:
+        for line in f:
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#'):
+                continue
+            if stripped == 'names:':
+                in_names = True
+            elif in_names and line[0] in ' \t' and ':' in stripped:
+                key, value = stripped.split(':', 1)
+                names[int(key)] = value.strip()
+            else:
+                in_names = False
+    return [names[i] for i in sorted(names)]
+
+
+def list_val_images(dataset_dir):
+    """Return (image_path, label_path) pairs of the val split"""
+    image_dir = os.path.join(dataset_dir, 'images', 'val')
+    label_dir = os.path.join(dataset_dir, 'labels', 'val')
+    pairs = []
+    for filename in sorted(os.listdir(image_dir)):
+        stem, ext = os.path.splitext(filename)
+        if ext.lower() in ('.jpg', '.jpeg', '.png', '.bmp'):
+            pairs.append((os.path.join(image_dir, filename),
+                          os.path.join(label_dir, stem + '.txt')))
+    return pairs
+
+
+def load_labels(label_path):
+    """Read a YOLO label file as (class_ids, normalized xyxy boxes)"""
+    if not os.path.exists(label_path):
+        return np.zeros(0, dtype=int), np.zeros((0, 4))
+    rows = np.loadtxt(label_path, ndmin=2)
+    if rows.size == 0:
+        return np.zeros(0, dtype=int), np.zeros((0, 4))
+    cx, cy, w, h = rows[:, 1], rows[:, 2], rows[:, 3], rows[:, 4]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    return rows[:, 0].astype(int), boxes
+
+
+def file_digest(path):
+    """SHA1 of a file's contents"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def config_hash(config, weights, images):
+    """Hash everything that changes the predictions"""
+    digest = hashlib.sha1()
+    digest.update(json.dumps(config, sort_keys=True).encode())
+    for path in weights + images:
+        digest.update(os.path.basename(path).encode())
+        digest.update(file_digest(path).encode())
+    return digest.hexdigest()[:16]
+
+
+def make_darknet_predictor(conf, imgsz):
+    """Return (predict function, weight files) for the yolov3-tiny model"""
+    from object_detection import download_yolo_files, load_yolo_model, find_objects
+
+    if not download_yolo_files():
+        raise RuntimeError("Could not download the YOLOv3-tiny model files")
+    net, classes, colors, output_layers = load_yolo_model()
+
+    def predict(image):
+        boxes, confidences, class_ids = find_objects(image, net, output_layers,
+                                                     confidence_threshold=conf, input_size=imgsz)
+        xyxy = np.array(boxes, dtype=np.float32).reshape(-1, 4)
+        xyxy[:, 2:] += xyxy[:, :2]
+        return xyxy, np.array(confidences, dtype=np.float32), np.array(class_ids, dtype=int)
+
+    return predict, ['yolov3-tiny.weights', 'yolov3-tiny.cfg']
+
+
+def make_custom_predictor(conf, imgsz, model_path):
+    """Return (predict function, weight files) for the custom YOLOv8 model"""
+    from ultralytics import YOLO
+
+    model = YOLO(model_path)
+
+    def predict(image):
+        boxes = model(image, conf=conf, imgsz=imgsz, verbose=False)[0].boxes
+        return (boxes.xyxy.cpu().numpy().astype(np.float32), boxes.conf.cpu().numpy(),
+                boxes.cls.cpu().numpy().astype(int))
+
+    return predict, [model_path]
+
+
+def run_predictions(predict, pairs):
+    """
+    Run the detector over the val images and time the inference.
+    predict(image) returns (xyxy pixel boxes, scores, class_ids) as arrays.
+    Returns (predictions, image_sizes, seconds), where predictions is a dict
+    of per-detection arrays: image, class_id, score and box (float32 xyxy).
+    """
+    # Start each list with an empty array so an empty val split still concatenates
+    columns = {'image': [np.zeros(0, dtype=int)], 'class_id': [np.zeros(0, dtype=int)],
+               'score': [np.zeros(0, dtype=np.float32)], 'box': [np.zeros((0, 4), dtype=np.float32)]}
+    image_sizes = np.zeros((len(pairs), 2))
+    seconds = np.zeros(len(pairs))
+
+    images = []
+    for image_path, _ in pairs:
+        image = cv2.imread(image_path)
+        if image is None:
+            raise ValueError(f"Could not read image: {image_path}")
+        images.append(image)
+
+    # One warm-up pass so model initialization is not counted as throughput
+    if images:
+        predict(images[0])
+
+    for index, image in enumerate(images):
+        image_sizes[index] = image.shape[1], image.shape[0]
+        start = time.perf_counter()
+        boxes, scores, class_ids = predict(image)
+        seconds[index] = time.perf_counter() - start
+        columns['image'].append(np.full(len(scores), index))
+        columns['class_id'].append(np.asarray(class_ids, dtype=int))
+        columns['score'].append(np.asarray(scores, dtype=np.float32))
+        columns['box'].append(np.asarray(boxes, dtype=np.float32).reshape(-1, 4))
+
+    predictions = {key: np.concatenate(parts) for key, parts in columns.items()}
+    return predictions, image_sizes, seconds
+
+
+def box_iou(a, b):
+    """IoU matrix between (N, 4) and (M, 4) xyxy boxes"""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection + 1e-9)
+
+
+def match_predictions(pred_boxes, pred_scores, gt_boxes):
+    """
+    Greedily match one image's predictions of one class to its ground truth
+    at every IoU threshold at once. Returns a (num_preds, num_thresholds)
+    true-positive table in the original prediction order.
+    """
+    tp = np.zeros((len(pred_boxes), len(IOU_THRESHOLDS)), dtype=bool)
+    if not len(pred_boxes) or not len(gt_boxes):
+        return tp
+
+    iou = box_iou(pred_boxes, gt_boxes)
+    used = np.zeros((len(IOU_THRESHOLDS), len(gt_boxes)), dtype=bool)
+    thresholds = IOU_THRESHOLDS[:, None]
+    columns = np.arange(len(IOU_THRESHOLDS))
+    for p in np.argsort(-pred_scores, kind='stable'):
+        candidates = np.where((iou[p] >= thresholds) & ~used, iou[p], -1.0)
+        best = candidates.argmax(axis=1)
+        hit = candidates[columns, best] >= 0
+        used[columns[hit], best[hit]] = True
+        tp[p] = hit
+    return tp
+
+
+def average_precision(tp, scores, num_gt):
+    """COCO 101-point interpolated AP for each IoU threshold"""
+    if num_gt == 0:
+        return None
+    if not len(scores):
+        return np.zeros(len(IOU_THRESHOLDS))
+
+    order = np.argsort(-scores, kind='stable')
+    tp_cum = np.cumsum(tp[order], axis=0)
+    fp_cum = np.cumsum(~tp[order], axis=0)
+    recall = tp_cum / num_gt
+    precision = tp_cum / (tp_cum + fp_cum)
+
+    # Precision envelope: best precision at this recall or any higher one
+    precision = np.flip(np.maximum.accumulate(np.flip(precision, axis=0), axis=0), axis=0)
+
+    recall_points = np.linspace(0, 1, 101)
+    ap = np.zeros(len(IOU_THRESHOLDS))
+    for t in range(len(IOU_THRESHOLDS)):
+        index = np.searchsorted(recall[:, t], recall_points, side='left')
+        valid = index < len(recall)
+        ap[t] = precision[index[valid], t].sum() / len(recall_points)
+    return ap
+
+
+def evaluate(predictions, image_sizes, pairs, num_classes, agnostic=False):
+    """Return per-class AP arrays (None for classes without ground truth)"""
+    image = predictions['image']
+    scores = predictions['score']
+    pred_class = np.zeros(len(image), dtype=int) if agnostic else predictions['class_id'].astype(int)
+
+    # Predictions to normalized xyxy so they line up with the YOLO labels
+    pred_boxes = predictions['box'].astype(float) / np.tile(image_sizes[image], 2)
+
+    tp = np.zeros((len(image), len(IOU_THRESHOLDS)), dtype=bool)
+    num_gt = np.zeros(num_classes, dtype=int)
+
+    for index, (_, label_path) in enumerate(pairs):
+        gt_class, gt_boxes = load_labels(label_path)
+        if agnostic:
+            gt_class = np.zeros_like(gt_class)
+        num_gt += np.bincount(gt_class, minlength=num_classes)[:num_classes]
+
+        in_image = image == index
+        for class_id in np.unique(np.concatenate([gt_class, pred_class[in_image]])):
+            selected = np.flatnonzero(in_image & (pred_class == class_id))
+            tp[selected] = match_predictions(pred_boxes[selected], scores[selected],
+                                             gt_boxes[gt_class == class_id])
+
+    return [average_precision(tp[pred_class == c], scores[pred_class == c], num_gt[c])
+            for c in range(num_classes)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a detector on the val split")
+    parser.add_argument('--detector', choices=['custom', 'darknet'], default='custom')
+    parser.add_argument('--model', default="runs/detect/physics_equipment/weights/best.pt",
+                        help="weights for the custom detector")
+    parser.add_argument('--conf', type=float, default=0.001,
+                        help="confidence threshold (keep low for mAP)")
+    parser.add_argument('--imgsz', type=int, default=None,
+                        help="network input size (default 640 custom / 416 darknet)")
+    parser.add_argument('--agnostic', action='store_true',
+                        help="merge all classes into one before matching")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="ignore cached predictions and measure throughput again")
+    args = parser.parse_args()
+
+    if args.detector == 'darknet' and not args.agnostic:
+        print("[NOTE] The darknet model predicts COCO classes, evaluating class-agnostic (--agnostic)")
+        args.agnostic = True
+
+    imgsz = args.imgsz or (640 if args.detector == 'custom' else 416)
+    class_names = ['object'] if args.agnostic else load_class_names(os.path.join(DATASET_DIR, 'data.yaml'))
+    pairs = list_val_images(DATASET_DIR)
+
+    print("=" * 60)
+    print("Detector Evaluation - Validation Split")
+    print("=" * 60)
+    print(f"Detector:   {args.detector}")
+    print(f"Input size: {imgsz}")
+    print(f"Confidence: {args.conf}")
+    print(f"Images:     {len(pairs)}")
+    print()
+
+    if args.detector == 'custom':
+        weights = [args.model]
+    else:
+        weights = ['yolov3-tiny.weights', 'yolov3-tiny.cfg']
+    config = {'detector': args.detector, 'conf': args.conf, 'imgsz': imgsz, 'cache': CACHE_VERSION}
+
+    missing = [path for path in weights if not os.path.exists(path)]
+    if args.detector == 'custom' and missing:
+        print(f"[ERROR] Model not found: {missing[0]}")
+        print("Make sure you've trained the model first using: python train_local.py")
+        return
+
+    cache_path = None
+    if not missing:
+        key = config_hash(config, weights, [image for image, _ in pairs])
+        cache_path = os.path.join(CACHE_DIR, f"{args.detector}_{key}.npz")
+
+    timing = 'measured'
+    if cache_path and os.path.exists(cache_path) and not args.no_cache:
+        print(f"[OK] Using cached predictions: {cache_path}")
+        cached = np.load(cache_path)
+        predictions = {key: cached[key] for key in ('image', 'class_id', 'score', 'box')}
+        image_sizes, seconds = cached['image_sizes'], cached['seconds']
+        timing = 'cached'
+    else:
+        print("Running inference...")
+        if args.detector == 'custom':
+            predict, weights = make_custom_predictor(args.conf, imgsz, args.model)
+        else:
+            predict, weights = make_darknet_predictor(args.conf, imgsz)
+        try:
+            predictions, image_sizes, seconds = run_predictions(predict, pairs)
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+            return
+
+        if cache_path is None:
+            key = config_hash(config, weights, [image for image, _ in pairs])
+            cache_path = os.path.join(CACHE_DIR, f"{args.detector}_{key}.npz")
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        np.savez(cache_path, image_sizes=image_sizes, seconds=seconds, **predictions)
+        print(f"[OK] Cached predictions: {cache_path}")
+    print()
+
+    aps = evaluate(predictions, image_sizes, pairs, len(class_names), agnostic=args.agnostic)
+
+    print(f"{'Class':<30}{'AP50':>10}{'AP50-95':>10}")
+    print("-" * 50)
+    for name, ap in zip(class_names, aps):
+        if ap is not None:
+            print(f"{name:<30}{ap[0]:>10.3f}{ap.mean():>10.3f}")
+
+    scored = np.array([ap for ap in aps if ap is not None])
+    map50 = scored[:, 0].mean() if len(scored) else 0.0
+    map50_95 = scored.mean() if len(scored) else 0.0
+    total_seconds = seconds.sum()
+    fps = len(seconds) / total_seconds if total_seconds > 0 else 0.0
+    ms_per_image = 1000 * total_seconds / len(seconds) if len(seconds) else 0.0
+
+    print("-" * 50)
+    print(f"{'mAP':<30}{map50:>10.3f}{map50_95:>10.3f}")
+    print()
+    print(f"Throughput: {fps:.1f} images/s ({ms_per_image:.1f} ms/image)")
+    if timing == 'cached':
+        print("            (measured when the predictions were cached; --no-cache to re-time)")
+
+    # Append to the results table so settings can be compared on one curve
+    new_file = not os.path.exists(RESULTS_CSV)
+    with open(RESULTS_CSV, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(['detector', 'imgsz', 'conf', 'agnostic', 'mAP50', 'mAP50-95', 'fps',
+                             'timing', 'cache'])
+        writer.writerow([args.detector, imgsz, args.conf, args.agnostic,
+                         f"{map50:.4f}", f"{map50_95:.4f}", f"{fps:.2f}", timing,
+                         os.path.basename(cache_path)])
+    print(f"Results appended to {RESULTS_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ import cv2
 import numpy as np
 import urllib.request
 import os
+import time
+from detection_log import DetectionLogWriter
 
 def download_yolo_files():
     """Download YOLO model files if they don't exist"""
@@ -50,16 +52,15 @@ def load_yolo_model():
     
     return net, classes, colors, output_layers
 
-def detect_objects(frame, net, classes, colors, output_layers, confidence_threshold=0.3):
-    """Detect objects in a frame"""
+def find_objects(frame, net, output_layers, confidence_threshold=0.3, input_size=416):
+    """Run the network on a frame and return boxes, confidences and class_ids after NMS"""
     height, width, channels = frame.shape
     
     # Detecting objects
-    blob = cv2.dnn.blobFromImage(frame, 0.00392, (416, 416), (0, 0, 0), True, crop=False)
+    blob = cv2.dnn.blobFromImage(frame, 0.00392, (input_size, input_size), (0, 0, 0), True, crop=False)
     net.setInput(blob)
     outs = net.forward(output_layers)
     
-    # Showing information on the screen
     class_ids = []
     confidences = []
     boxes = []
@@ -83,34 +84,44 @@ def detect_objects(frame, net, classes, colors, output_layers, confidence_thresh
                 
                 boxes.append([x, y, w, h])
                 confidences.append(float(confidence))
-                class_ids.append(class_id)
+                class_ids.append(int(class_id))
     
     # Apply non-max suppression to remove overlapping boxes
-    indexes = cv2.dnn.NMSBoxes(boxes, confidences, confidence_threshold, 0.4)
+    indexes = np.array(cv2.dnn.NMSBoxes(boxes, confidences, confidence_threshold, 0.4)).flatten()
     
-    # Draw bounding boxes and labels
+    boxes = [boxes[i] for i in indexes]
+    confidences = [confidences[i] for i in indexes]
+    class_ids = [class_ids[i] for i in indexes]
+    
+    return boxes, confidences, class_ids
+
+def draw_detections(frame, boxes, confidences, class_ids, classes, colors):
+    """Draw bounding boxes and labels on a frame"""
     font = cv2.FONT_HERSHEY_SIMPLEX
-    for i in range(len(boxes)):
-        if i in indexes:
-            x, y, w, h = boxes[i]
-            label = str(classes[class_ids[i]])
-            confidence = confidences[i]
-            color = colors[class_ids[i]]
-            
-            # Draw rectangle
-            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
-            
-            # Draw label with background
-            label_text = f"{label}: {confidence:.2f}"
-            label_size, _ = cv2.getTextSize(label_text, font, 0.6, 2)
-            
-            # Draw background rectangle for text
-            cv2.rectangle(frame, (x, y - 25), (x + label_size[0], y), color, -1)
-            
-            # Draw text
-            cv2.putText(frame, label_text, (x, y - 5), font, 0.6, (0, 0, 0), 2)
+    for (x, y, w, h), confidence, class_id in zip(boxes, confidences, class_ids):
+        label = str(classes[class_id])
+        color = colors[class_id]
+        
+        # Draw rectangle
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+        
+        # Draw label with background
+        label_text = f"{label}: {confidence:.2f}"
+        label_size, _ = cv2.getTextSize(label_text, font, 0.6, 2)
+        
+        # Draw background rectangle for text
+        cv2.rectangle(frame, (x, y - 25), (x + label_size[0], y), color, -1)
+        
+        # Draw text
+        cv2.putText(frame, label_text, (x, y - 5), font, 0.6, (0, 0, 0), 2)
     
-    return frame, len(indexes)
+    return frame
+
+def detect_objects(frame, net, classes, colors, output_layers, confidence_threshold=0.3):
+    """Detect objects in a frame"""
+    boxes, confidences, class_ids = find_objects(frame, net, output_layers, confidence_threshold)
+    frame = draw_detections(frame, boxes, confidences, class_ids, classes, colors)
+    return frame, len(boxes)
 
 
 
@@ -182,10 +193,12 @@ def main():
     print("CONTROLS:")
     print("  Press 'q' to quit")
     print("  Press 's' to save current frame")
+    print("  Press 'l' to start/stop logging detections")
     print("=" * 60)
     print()
     
     frame_count = 0
+    detection_log = None
     failed_frames = 0
     max_failed_frames = 10  # Allow some failed frames before giving up
     
@@ -207,14 +220,20 @@ def main():
         
         # Perform object detection every frame
         if model_loaded:
-            frame, num_objects = detect_objects(frame, net, classes, colors, output_layers, confidence_threshold=0.25)
+            boxes, confidences, class_ids = find_objects(frame, net, output_layers, confidence_threshold=0.25)
+            if detection_log is not None:
+                detection_log.append_frame(frame_count, time.time(), boxes, confidences, class_ids)
+            frame = draw_detections(frame, boxes, confidences, class_ids, classes, colors)
+            num_objects = len(boxes)
             
             # Display object count and frame number
             cv2.putText(frame, f"Objects: {num_objects} | Frame: {frame_count}", (10, 30),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         
         # Display instructions
-        instructions = "Press 'q' to quit | 's' to save"
+        instructions = "Press 'q' to quit | 's' to save | 'l' to log"
+        if detection_log is not None:
+            instructions += " [LOGGING]"
         cv2.putText(frame, instructions, (10, frame.shape[0] - 10),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
         
@@ -231,8 +250,21 @@ def main():
             filename = f"detection_frame_{frame_count}.jpg"
             cv2.imwrite(filename, frame)
             print(f"Saved frame as {filename}")
+        elif key == ord('l'):
+            if detection_log is None:
+                try:
+                    detection_log = DetectionLogWriter("detections.dlog")
+                    print("Logging detections to detections.dlog")
+                except (OSError, ValueError) as e:
+                    print(f"Could not open detection log: {e}")
+            else:
+                detection_log.close()
+                detection_log = None
+                print("Stopped logging detections")
     
     # Release resources
+    if detection_log is not None:
+        detection_log.close()
     cap.release()
     cv2.destroyAllWindows()
     print("Webcam released and windows closed.")
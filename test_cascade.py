@@ -0,0 +1,148 @@
+import time
+import numpy as np
+from cascade import Cascade, MotionGate, crop_region
+
+
+class ScriptedGate:
+    """Gate returning a fixed (passed, candidates) per call"""
+
+    baseline = "custom every frame"
+    threshold = 0.5
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+
+    def warmup(self, frame):
+        pass
+
+    def __call__(self, frame):
+        passed, candidates = self.script[self.calls % len(self.script)]
+        self.calls += 1
+        return passed, candidates, ([], [], [])
+
+
+class StubModel:
+    """Custom model stand-in returning fixed boxes and recording input shapes"""
+
+    def __init__(self, boxes=([10, 10, 20, 20],), first_call_seconds=0.0):
+        self.boxes = [list(box) for box in boxes]
+        self.first_call_seconds = first_call_seconds
+        self.shapes = []
+
+    def __call__(self, image):
+        if not self.shapes and self.first_call_seconds:
+            time.sleep(self.first_call_seconds)
+        self.shapes.append(image.shape[:2])
+        return [list(box) for box in self.boxes], [0.9] * len(self.boxes), [0] * len(self.boxes)
+
+
+FRAME = np.zeros((480, 640, 3), dtype=np.uint8)
+
+
+def test_crop_region_empty():
+    assert crop_region([], FRAME.shape) is None
+
+
+def test_crop_region_padding():
+    # Union of both boxes is 100x50 at (100, 100); 25% padding each side
+    assert crop_region([[100, 100, 40, 20], [160, 130, 40, 20]], FRAME.shape) == (75, 87, 225, 162)
+
+
+def test_crop_region_clamped_to_frame():
+    assert crop_region([[0, 0, 40, 40]], FRAME.shape) == (0, 0, 50, 50)
+    assert crop_region([[600, 440, 40, 40]], FRAME.shape) == (590, 430, 640, 480)
+
+
+def test_crop_region_large_falls_back_to_full_frame():
+    assert crop_region([[0, 0, 600, 400]], FRAME.shape) is None
+    assert crop_region([[0, 0, 600, 400]], FRAME.shape, max_area=1.0) == (0, 0, 640, 480)
+
+
+def test_pass_audit_and_miss_counts():
+    # Frames 1..6: the gate passes every other frame, audits on frames 1 and 4
+    gate = ScriptedGate([(False, []), (True, [])])
+    model = StubModel()
+    cascade = Cascade(gate, model, mode='frame', audit_every=3)
+    for _ in range(6):
+        cascade(FRAME)
+
+    stats = cascade.stats()
+    assert stats['frames'] == 6
+    assert stats['pass_rate'] == 0.5
+    # Frame 1 was dropped by the gate although the model finds something
+    assert cascade.audited == 2 and cascade.missed == 1
+    assert stats['miss_rate'] == 0.5
+    # Three passing frames plus the dropped audit frame ran on the full frame
+    assert cascade.full_custom_calls == 4
+    assert stats['crop_miss_rate'] is None
+
+
+def test_empty_audits_are_not_counted():
+    cascade = Cascade(ScriptedGate([(False, [])]), StubModel(boxes=()), audit_every=1)
+    for _ in range(3):
+        cascade(FRAME)
+    assert cascade.audited == 0 and cascade.stats()['miss_rate'] == 0.0
+
+
+def test_speedup_unknown_without_full_frame_run():
+    cascade = Cascade(ScriptedGate([(False, [])]), StubModel(), audit_every=0)
+    for _ in range(3):
+        cascade(FRAME)
+    stats = cascade.stats()
+    assert stats['speedup'] is None and stats['baseline_fps'] is None
+
+    cascade.gate = ScriptedGate([(True, [])])
+    cascade(FRAME)
+    assert cascade.stats()['speedup'] is not None
+
+
+def test_crops_mode_runs_on_crop_and_shifts_boxes():
+    gate = ScriptedGate([(True, [[100, 100, 40, 20]])])
+    model = StubModel()
+    cascade = Cascade(gate, model, mode='crops', audit_every=0)
+    _, (boxes, _, _) = cascade(FRAME)
+
+    assert model.shapes == [(30, 60)]
+    assert boxes == [[100, 105, 20, 20]]
+    assert cascade.full_custom_calls == 0
+
+
+def test_crops_mode_audit_counts_detections_outside_crop():
+    gate = ScriptedGate([(True, [[100, 100, 40, 20]])])
+    # One detection inside the crop (90, 95, 150, 125), one far outside
+    model = StubModel(boxes=([110, 100, 10, 10], [400, 300, 20, 20]))
+    cascade = Cascade(gate, model, mode='crops', audit_every=1)
+    _, (boxes, _, _) = cascade(FRAME)
+
+    # Audit frames return the full-frame detections
+    assert model.shapes == [(480, 640), (30, 60)]
+    assert len(boxes) == 2
+    assert cascade.crop_audited == 2 and cascade.crop_missed == 1
+    assert cascade.stats()['crop_miss_rate'] == 0.5
+
+
+def test_warmup_not_counted():
+    model = StubModel(first_call_seconds=0.2)
+    cascade = Cascade(ScriptedGate([(True, [])]), model, audit_every=1)
+    cascade.warmup(FRAME)
+    assert cascade.frames == 0 and cascade.full_custom_calls == 0
+
+    cascade(FRAME)
+    assert cascade.full_custom_seconds < 0.1
+
+
+def test_motion_gate():
+    gate = MotionGate(threshold=0.01)
+    still = np.zeros((240, 320, 3), dtype=np.uint8)
+    moved = still.copy()
+    moved[100:180, 160:240] = 255
+
+    assert gate(still)[0]
+    assert not gate(still)[0]
+
+    passed, candidates, detections = gate(moved)
+    assert passed and detections == ([], [], [])
+    x, y, w, h = candidates[0]
+    assert 140 <= x <= 160 and 80 <= y <= 100
+    assert 230 <= x + w <= 250 and 170 <= y + h <= 190
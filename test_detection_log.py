@@ -0,0 +1,132 @@
+import os
+import numpy as np
+import pytest
+from detection_log import (DETECTION_DTYPE, HEADER_SIZE, INDEX_DTYPE, DetectionLogReader,
+                           DetectionLogWriter)
+
+
+def write_session(path, frames, class_of=lambda f: f % 3, t0=0.0, chunk_size=4):
+    """One writer session with one detection per frame, timestamp t0 + frame"""
+    with DetectionLogWriter(path, chunk_size=chunk_size) as log:
+        for f in frames:
+            log.append_frame(f, t0 + f, [[f, f, 10, 10]], [0.5], [class_of(f)])
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'detections.dlog')
+
+
+def test_round_trip(path):
+    write_session(path, range(1, 11))
+    reader = DetectionLogReader(path)
+    assert len(reader) == 10
+    assert reader.records.dtype == DETECTION_DTYPE
+    np.testing.assert_array_equal(reader.records['frame'], np.arange(1, 11))
+    np.testing.assert_array_equal(reader.records['box'][2], [3, 3, 10, 10])
+    assert len(reader.index) == 3
+
+
+def test_frame_and_query(path):
+    write_session(path, range(1, 21))
+    reader = DetectionLogReader(path)
+
+    assert reader.frame(7)['timestamp'].tolist() == [7.0]
+    assert len(reader.frame(99)) == 0
+    assert reader.query(t_start=5, t_end=9)['frame'].tolist() == [5, 6, 7, 8]
+    assert reader.query(class_id=0)['frame'].tolist() == [3, 6, 9, 12, 15, 18]
+    assert reader.query(t_start=10, class_id=1)['frame'].tolist() == [10, 13, 16, 19]
+
+
+def test_class_mask_collision_is_filtered(path):
+    # Classes 1 and 65 share a bit in the chunk mask
+    write_session(path, range(1, 5), class_of=lambda f: 65)
+    reader = DetectionLogReader(path)
+    assert len(reader.query(class_id=1)) == 0
+    assert len(reader.query(class_id=65)) == 4
+
+
+def test_sessions_keep_caller_frame_numbers(path):
+    write_session(path, range(1, 51))
+    write_session(path, [80], t0=1000.0)
+    reader = DetectionLogReader(path)
+
+    assert reader.sessions == [0, 1]
+    assert reader.frame(80)['timestamp'].tolist() == [1080.0]
+    write_session(path, [5], t0=2000.0)
+    reader = DetectionLogReader(path)
+    assert reader.frame(5)['timestamp'].tolist() == [5.0, 2005.0]
+    assert reader.frame(5, session=2)['timestamp'].tolist() == [2005.0]
+    assert reader.query(session=0)['frame'].tolist() == list(range(1, 51))
+
+
+def test_decreasing_frame_in_session_rejected(path):
+    with DetectionLogWriter(path) as log:
+        log.append_frame(5, 0.0, [[0, 0, 1, 1]], [0.5], [0])
+        with pytest.raises(ValueError):
+            log.append_frame(4, 0.0, [[0, 0, 1, 1]], [0.5], [0])
+
+
+def test_torn_data_tail_dropped_on_reopen(path):
+    write_session(path, range(1, 9))
+    with open(path, 'ab') as f:
+        f.write(b'\x01' * (DETECTION_DTYPE.itemsize + 5))
+
+    assert len(DetectionLogReader(path)) == 8
+    write_session(path, [9])
+    reader = DetectionLogReader(path)
+    assert reader.records['frame'].tolist() == list(range(1, 10))
+    assert os.path.getsize(path) == HEADER_SIZE + 9 * DETECTION_DTYPE.itemsize
+
+
+def test_partial_index_entry_dropped_on_reopen(path):
+    write_session(path, range(1, 9))
+    with open(path + '.idx', 'ab') as f:
+        f.write(b'\x01' * (INDEX_DTYPE.itemsize // 2))
+
+    assert len(DetectionLogReader(path).index) == 2
+    write_session(path, [9])
+    assert DetectionLogReader(path).records['frame'].tolist() == list(range(1, 10))
+
+
+def test_index_past_end_of_data_is_dropped(path):
+    write_session(path, range(1, 9))
+    with open(path, 'r+b') as f:
+        f.truncate(HEADER_SIZE + 6 * DETECTION_DTYPE.itemsize)
+
+    assert DetectionLogReader(path).records['frame'].tolist() == [1, 2, 3, 4]
+    write_session(path, [9])
+    assert DetectionLogReader(path).records['frame'].tolist() == [1, 2, 3, 4, 9]
+    assert os.path.getsize(path) == HEADER_SIZE + 5 * DETECTION_DTYPE.itemsize
+
+
+def test_rebuild_deleted_index(path):
+    write_session(path, range(1, 7))
+    write_session(path, range(1, 4), t0=100.0)
+    os.remove(path + '.idx')
+
+    write_session(path, [1], t0=200.0)
+    reader = DetectionLogReader(path)
+    assert len(reader) == 10
+    assert reader.sessions == [0, 1, 2]
+    assert reader.frame(2)['timestamp'].tolist() == [2.0, 102.0]
+    assert reader.frame(1, session=2)['timestamp'].tolist() == [201.0]
+
+
+def test_empty_log(path):
+    DetectionLogWriter(path).close()
+    reader = DetectionLogReader(path)
+    assert len(reader) == 0
+    assert reader.sessions == []
+    assert len(reader.frame(1)) == 0
+    assert len(reader.query(t_start=0, class_id=0)) == 0
+
+    write_session(path, [1])
+    assert len(DetectionLogReader(path)) == 1
+
+
+def test_not_a_log(path):
+    with open(path, 'wb') as f:
+        f.write(b'xx')
+    with pytest.raises(ValueError):
+        DetectionLogWriter(path)
@@ -0,0 +1,47 @@
+import numpy as np
+from evaluate import IOU_THRESHOLDS, average_precision, box_iou, match_predictions
+
+
+def test_box_iou():
+    a = np.array([[0, 0, 10, 10]], dtype=float)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], dtype=float)
+    np.testing.assert_allclose(box_iou(a, b), [[1.0, 1 / 3, 0.0]], atol=1e-6)
+
+
+def test_perfect_predictions():
+    gt = np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=float)
+    scores = np.array([0.9, 0.8])
+    tp = match_predictions(gt.copy(), scores, gt)
+    assert tp.all()
+    np.testing.assert_allclose(average_precision(tp, scores, len(gt)), 1.0)
+
+
+def test_tp_fp_tp():
+    gt = np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=float)
+    preds = np.array([[0, 0, 10, 10], [50, 50, 60, 60], [20, 20, 30, 30]], dtype=float)
+    scores = np.array([0.9, 0.8, 0.7])
+    tp = match_predictions(preds, scores, gt)
+    np.testing.assert_array_equal(tp[:, 0], [True, False, True])
+    # 51 recall points at precision 1, 50 at precision 2/3
+    expected = (51 + 50 * 2 / 3) / 101
+    np.testing.assert_allclose(average_precision(tp, scores, len(gt)), expected)
+    assert round(expected, 3) == 0.835
+
+
+def test_crowded_gt_greedy_matching():
+    gt = np.array([[0, 0, 10, 10], [3, 0, 13, 10]], dtype=float)
+    # The higher scored prediction overlaps both ground truth boxes and takes
+    # the best one (IoU 0.818); the second one is left with IoU 0.538
+    preds = np.array([[1, 0, 11, 10], [0, 0, 10, 10]], dtype=float)
+    scores = np.array([0.9, 0.8])
+    tp = match_predictions(preds, scores, gt)
+
+    first = IOU_THRESHOLDS <= 0.8
+    np.testing.assert_array_equal(tp[0], first)
+    # Second prediction: matches the leftover box at 0.5, nothing while the
+    # first holds the shared box, and the shared box once the first misses
+    np.testing.assert_array_equal(tp[1], (IOU_THRESHOLDS < 0.55) | ~first)
+
+
+def test_no_ground_truth():
+    assert average_precision(np.zeros((1, len(IOU_THRESHOLDS)), dtype=bool), np.array([0.5]), 0) is None